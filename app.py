@@ -2,26 +2,18 @@
 M&A Tax Risk Assessment AI - Streamlit Application
 """
 import streamlit as st
+import hashlib
+import shutil
+import threading
+from concurrent.futures import Future
 from pathlib import Path
-import time
-from utils.document_processor import DocumentProcessor
-from utils.vector_store import VectorStoreManager
-from utils.rag_engine import RAGEngine
-from utils.tax_analyzer import TaxAnalyzer
+from utils.ingest_index import IngestIndex
 from utils.logger import setup_logger
-from config import APP_TITLE, APP_ICON, MAX_FILE_SIZE_MB, UPLOAD_DIR
+from config import APP_TITLE, APP_ICON, MAX_FILE_SIZE_MB, UPLOAD_DIR, ANN_PROFILE, EMBEDDING_MODEL
 
 logger = setup_logger("app")
 
-st.set_page_config(
-    page_title=APP_TITLE,
-    page_icon=APP_ICON,
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# Custom CSS
-st.markdown("""
+CUSTOM_CSS = """
 <style>
     .main-header {
         font-size: 2.5rem;
@@ -81,21 +73,91 @@ st.markdown("""
         margin: 1rem 0;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
 
-# Initialize session state
-if 'doc_processor' not in st.session_state:
-    st.session_state.doc_processor = DocumentProcessor()
+UPLOAD_READ_CHUNK = 1024 * 1024
+
+def hash_uploaded_file(uploaded_file) -> str:
+    """SHA-256 of an uploaded file, read in 1 MB chunks"""
+    digest = hashlib.sha256()
+    uploaded_file.seek(0)
+    for block in iter(lambda: uploaded_file.read(UPLOAD_READ_CHUNK), b""):
+        digest.update(block)
+    return digest.hexdigest()
+
+def hash_file(file_path: Path) -> str:
+    """SHA-256 of a file on disk, read in 1 MB chunks"""
+    with open(file_path, 'rb') as f:
+        return hash_uploaded_file(f)
+
+st.set_page_config(
+    page_title=APP_TITLE,
+    page_icon=APP_ICON,
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
 
-if 'vector_store' not in st.session_state:
-    st.session_state.vector_store = VectorStoreManager()
+# Custom CSS - Streamlit drops any element a rerun does not emit again,
+# so the stylesheet is re-sent each run from this prebuilt constant
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
+# Shared resources - one instance per server process, reused by every session.
+# The heavy modules (langchain, chromadb, onnxruntime) are imported on first use;
+# the vector store is built by the warm-up thread so the page can render first.
+@st.cache_resource
+def get_doc_processor():
+    from utils.document_processor import DocumentProcessor
+    return DocumentProcessor()
+
+@st.cache_resource
+def start_model_warmup() -> Future:
+    """Build the vector store and load the embedding model in the background, once per
+    server process; the returned future resolves to the store as soon as it is built"""
+    store_future = Future()
+    
+    def warm_up():
+        try:
+            from utils.vector_store import VectorStoreManager
+            store = VectorStoreManager()
+        except Exception as e:
+            store_future.set_exception(e)
+            return
+        store_future.set_result(store)
+        store.ensure_model_loaded()
+    
+    threading.Thread(target=warm_up, daemon=True).start()
+    return store_future
+
+def get_vector_store():
+    """The single vector store built by the warm-up thread, waiting for it if needed"""
+    # The thread has no script run context, so a @st.cache_resource factory called
+    # there would not be cached; the cached future owns the one instance instead
+    store_future = start_model_warmup()
+    try:
+        return store_future.result()
+    except Exception:
+        # Drop the failed future so the next run retries the build
+        start_model_warmup.clear()
+        raise
 
-if 'rag_engine' not in st.session_state:
-    st.session_state.rag_engine = RAGEngine(st.session_state.vector_store)
+@st.cache_resource
+def get_rag_engine():
+    from utils.rag_engine import RAGEngine
+    return RAGEngine(get_vector_store())
 
+@st.cache_resource
+def get_ingest_index() -> IngestIndex:
+    return IngestIndex()
+
+vector_store_future = start_model_warmup()
+
+# Initialize session state
 if 'document_processed' not in st.session_state:
     st.session_state.document_processed = False
 
+if 'document_metadata' not in st.session_state:
+    st.session_state.document_metadata = None
+
 if 'analysis_results' not in st.session_state:
     st.session_state.analysis_results = None
 
@@ -133,15 +195,36 @@ with st.sidebar:
     
     st.markdown("---")
     st.markdown("### 📊 Database")
-    doc_count = st.session_state.vector_store.get_collection_count()
-    st.metric("Chunks", doc_count)
-    
-    if st.button("Clear", use_container_width=True):
-        st.session_state.vector_store.clear_collection()
-        st.session_state.document_processed = False
-        st.session_state.analysis_results = None
-        st.session_state.current_analysis = None
-        st.rerun()
+    # Until the warm-up thread has built the store, touching it here would block
+    # the script thread and hold up the whole page
+    if not vector_store_future.done():
+        doc_count = "N/A"
+        st.caption("Loading vector store...")
+    else:
+        doc_count = get_vector_store().get_collection_count()
+        st.metric("Chunks", doc_count)
+        st.caption(f"Embedding model: {EMBEDDING_MODEL.split('/')[-1]}")
+        index_settings = get_vector_store().get_index_settings()
+        st.caption(f"Search profile: {index_settings['profile'] or 'Chroma default'} ({index_settings['space']})")
+        if index_settings["profile"] != ANN_PROFILE:
+            st.caption(f"Profile '{ANN_PROFILE}' applies once the collection is cleared")
+        
+        cache_stats = get_vector_store().get_embedding_cache_stats()
+        if cache_stats["hits"] + cache_stats["misses"]:
+            st.caption(f"Embedding cache hit rate: {cache_stats['hit_rate']:.0%}")
+        
+        query_stats = get_vector_store().get_query_cache_stats()
+        if query_stats["hits"] + query_stats["misses"]:
+            st.caption(f"Query cache: {query_stats['hits']} hits / {query_stats['misses']} misses")
+        
+        if st.button("Clear", use_container_width=True):
+            get_vector_store().clear_collection()
+            get_ingest_index().clear()
+            st.session_state.document_processed = False
+            st.session_state.document_metadata = None
+            st.session_state.analysis_results = None
+            st.session_state.current_analysis = None
+            st.rerun()
     
     # Section toggles
     if st.session_state.analysis_results:
@@ -169,41 +252,71 @@ st.markdown('<div class="sub-header">Professional Due Diligence and Tax Exposure
 
 # Process uploaded file
 if uploaded_file and not st.session_state.document_processed:
-    file_path = UPLOAD_DIR / uploaded_file.name
+    doc_hash = hash_uploaded_file(uploaded_file)
+    ingested = get_ingest_index().get(doc_hash)
     
-    with open(file_path, 'wb') as f:
-        f.write(uploaded_file.getbuffer())
-    
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    
-    try:
-        status_text.text("📄 Extracting text...")
-        progress_bar.progress(33)
-        text, metadata, analysis, chunks = st.session_state.doc_processor.process_uploaded_file(file_path)
-        
-        status_text.text("🔢 Generating embeddings...")
-        progress_bar.progress(66)
-        ids = st.session_state.vector_store.add_documents(chunks)
+    if ingested:
+        # Identical content was already indexed - reuse it instead of re-running the pipeline
+        logger.info(f"Skipping ingestion for {uploaded_file.name}: content already indexed")
+        st.session_state.document_processed = True
+        st.session_state.document_metadata = ingested["metadata"]
+        st.session_state.current_analysis = ingested["analysis"]
+        st.success(f"✓ Already indexed as {ingested['metadata'].get('filename', uploaded_file.name)}: {len(ingested['chunk_ids'])} chunks")
+    else:
+        file_path = UPLOAD_DIR / uploaded_file.name
         
-        status_text.text("✅ Complete!")
-        progress_bar.progress(100)
-        time.sleep(0.3)
-        progress_bar.empty()
-        status_text.empty()
+        # A same-size file at the target path is usually a re-run of the same upload;
+        # confirm with the content hash (a read is cheaper than a rewrite) before skipping
+        already_on_disk = (
+            file_path.exists()
+            and file_path.stat().st_size == uploaded_file.size
+            and hash_file(file_path) == doc_hash
+        )
+        if not already_on_disk:
+            with open(file_path, 'wb') as f:
+                uploaded_file.seek(0)
+                shutil.copyfileobj(uploaded_file, f, length=UPLOAD_READ_CHUNK)
         
-        st.session_state.document_processed = True
-        st.session_state.current_analysis = analysis
-        st.success(f"✓ Processed: {len(chunks)} chunks indexed")
+        progress_bar = st.progress(0)
+        status_text = st.empty()
         
-    except Exception as e:
-        st.error(f"Error: {str(e)}")
+        try:
+            status_text.text("📄 Extracting text...")
+            metadata, analysis, chunks = get_doc_processor().process_uploaded_file(file_path, doc_hash)
+            progress_bar.progress(40)
+            
+            status_text.text("🔢 Generating embeddings...")
+            ids = get_vector_store().add_documents(
+                chunks,
+                progress_callback=lambda stored, total: progress_bar.progress(40 + int(60 * stored / total))
+            )
+            
+            get_ingest_index().put(doc_hash, {
+                "metadata": metadata,
+                "analysis": analysis,
+                "chunk_ids": ids
+            })
+            
+            progress_bar.empty()
+            status_text.empty()
+            
+            st.session_state.document_processed = True
+            st.session_state.document_metadata = metadata
+            st.session_state.current_analysis = analysis
+            st.success(f"✓ Processed: {len(chunks)} chunks indexed")
+            
+        except Exception as e:
+            st.error(f"Error: {str(e)}")
 
 # Tax Audit Outcomes & Indicators
 if st.session_state.current_analysis:
     st.markdown("---")
     st.markdown('<div class="section-header">🔍 Tax Audit Outcomes & Indicators</div>', unsafe_allow_html=True)
     
+    document_metadata = st.session_state.document_metadata
+    if document_metadata:
+        st.caption(f"{document_metadata.get('filename', 'Document')} · {document_metadata.get('pages', '?')} pages")
+    
     col1, col2, col3 = st.columns(3)
     
     tax_score = int(st.session_state.current_analysis.get('tax_relevance_score', 0) * 100)
@@ -260,7 +373,8 @@ if st.session_state.document_processed:
     with col2:
         if st.button("🔍 Generate Comprehensive Analysis", type="primary", use_container_width=True):
             with st.spinner("Analyzing..."):
-                analyzer = TaxAnalyzer(st.session_state.rag_engine)
+                from utils.tax_analyzer import TaxAnalyzer
+                analyzer = TaxAnalyzer(get_rag_engine())
                 st.session_state.analysis_results = analyzer.analyze_document()
                 st.session_state.show_executive = True
                 st.session_state.show_metrics = True
@@ -316,7 +430,8 @@ if st.session_state.analysis_results:
     
     # Download
     st.markdown("---")
-    analyzer = TaxAnalyzer(st.session_state.rag_engine)
+    from utils.tax_analyzer import TaxAnalyzer
+    analyzer = TaxAnalyzer(get_rag_engine())
     full_report = analyzer.generate_summary_report(st.session_state.analysis_results)
     
     col1, col2, col3 = st.columns([2, 1, 2])
@@ -350,10 +465,11 @@ if st.session_state.document_processed:
     
     if ask_btn and question:
         with st.spinner("Searching..."):
-            response = st.session_state.rag_engine.query(question)
+            response = get_rag_engine().query(question)
             st.success(response["answer"])
             
             if response["sources"]:
+                from utils.rag_engine import format_snippet
                 st.markdown("**Sources:**")
                 for idx, source in enumerate(response["sources"][:2], 1):
-                    st.caption(f"{idx}. {source['content'][:200]}...")
\ No newline at end of file
+                    st.caption(f"{idx}. {format_snippet(source, 200)}")
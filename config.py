@@ -13,10 +13,13 @@ BASE_DIR = Path(__file__).parent
 DATA_DIR = BASE_DIR / "data"
 UPLOAD_DIR = DATA_DIR / "uploads"
 VECTORDB_DIR = DATA_DIR / "vectordb"
+EMBED_CACHE_DIR = DATA_DIR / "embed_cache"
+PROCESSING_CACHE_DIR = DATA_DIR / "cache"
 LOGS_DIR = BASE_DIR / "logs"
+INGESTED_INDEX_PATH = UPLOAD_DIR / ".ingested.json"
 
 # Create directories if they don't exist
-for dir_path in [DATA_DIR, UPLOAD_DIR, VECTORDB_DIR, LOGS_DIR]:
+for dir_path in [DATA_DIR, UPLOAD_DIR, VECTORDB_DIR, EMBED_CACHE_DIR, PROCESSING_CACHE_DIR, LOGS_DIR]:
     dir_path.mkdir(parents=True, exist_ok=True)
 
 # API Configuration
@@ -25,17 +28,44 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 # Document Processing Configuration
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
+CHUNK_MIN_SIZE = 100  # smaller trailing chunks are merged into the previous one
+# "recursive" character chunks fit MiniLM's 256-token window; "pages" embeds groups
+# of PAGES_PER_CHUNK pages (far fewer chunks, but long pages are truncated when embedded)
+CHUNK_STRATEGY = os.getenv("CHUNK_STRATEGY", "recursive")
+PAGES_PER_CHUNK = 2
+PAGE_CHUNK_OVERLAP_RATIO = 0.1
 MAX_FILE_SIZE_MB = 100
+PARALLEL_EXTRACTION_MIN_PAGES = 16  # below this, pages are extracted in-process
+MAX_EXTRACTION_WORKERS = 4  # size of the shared extraction process pool (capped by CPU count)
+EXTRACTION_PAGES_PER_TASK = 8  # pages per parallel extraction task; bounds pages held in memory
+PROCESSING_CACHE_MAX_ENTRIES = 32  # processed documents kept in data/cache; least recently used are evicted
 
 # Vector Database Configuration
-EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"  # 384-dim; served from Chroma's ONNX export
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", "none")  # "none" (FP32) or opt-in "int8"; clear and re-ingest after switching
+EMBED_BATCH_SIZE = 64
 COLLECTION_NAME = "tax_documents"
+QUERY_EMBEDDING_CACHE_SIZE = 512
+EMBED_CACHE_DTYPE = "float16"  # float32 keeps cached vectors bit-exact
+INGEST_BATCH_SIZE = 64  # chunks embedded and written per window; bounds peak memory during ingestion
+
+# HNSW index settings - RAG_ANN_PROFILE selects fast, balanced or recall-max search.
+# Chroma fixes all of these when the collection is created, so a changed profile
+# (or space) only takes effect after the collection is cleared
+ANN_PROFILE = os.getenv("RAG_ANN_PROFILE", "balanced")
+ANN_SEARCH_EF = {"fast": 32, "balanced": 128, "recall-max": 256}
+HNSW_SPACE = "cosine"
+HNSW_CONSTRUCTION_EF = 200
+HNSW_M = 32
 
 # RAG Configuration - Groq Models
 TOP_K_RESULTS = 5
+MIN_RELEVANCE_SCORE = 0.25  # best-match cosine similarity below which the LLM isn't called (MiniLM)
 LLM_MODEL = "llama-3.3-70b-versatile"  # Options: llama-3.1-70b-versatile, mixtral-8x7b-32768
 TEMPERATURE = 0.3
 MAX_TOKENS = 2000
+ANSWER_CACHE_SIZE = 128
+GROQ_MAX_CONCURRENCY = 8  # parallel Groq requests during comprehensive analysis
 
 # UI Configuration
 APP_TITLE = "M&A Tax Risk Assessment Model"
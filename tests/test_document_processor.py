@@ -0,0 +1,93 @@
+"""
+Tests for the per-page _ContentStats analysis and parallel page extraction
+"""
+import pymupdf
+import pytest
+import utils.document_processor as document_processor
+from utils.document_processor import PAGE_SEPARATOR, DocumentProcessor, _ContentStats
+
+PAGES = [
+    "Annual report\nThe group's tax return was filed on time.",
+    "",
+    "An IRS audit raised a deficiency and a penalty.\nWithholding exemption applies.",
+    "Deferred tax liability of $1,200 relates to the adjustment."
+]
+
+def _expected(characters, words, financial, keywords, risks):
+    return {
+        "total_characters": characters,
+        "total_words": words,
+        "estimated_reading_time_minutes": round(words / 200, 1),
+        "contains_financial_data": financial,
+        "tax_keywords_found": keywords,
+        "tax_relevance_score": len(keywords) / 11,
+        "risk_indicators": risks
+    }
+
+# What the original whole-text analysis reported for each document's joined pages
+# (keyword lists in the sorted order the analysis now returns)
+BASELINE_ANALYSES = [
+    (PAGES, _expected(198, 31, True, ["audit", "exemption", "irs", "liability", "return", "tax", "withholding"], ["adjustment", "deficiency", "penalty"])),
+    (PAGES[:1], _expected(55, 10, True, ["return", "tax"], [])),
+    # A term split across a page break is not a match in the joined text either
+    (["The audit of with", "holding"], _expected(26, 5, False, ["audit"], [])),
+    (["no matching terms here"], _expected(22, 4, False, [], [])),
+    ([""], _expected(0, 0, False, [], [])),
+]
+
+@pytest.mark.parametrize("pages,expected", BASELINE_ANALYSES)
+def test_per_page_totals_match_the_whole_text_baseline(pages, expected):
+    stats = _ContentStats()
+    tracked = list(stats.track(enumerate(pages, 1)))
+
+    assert tracked == list(enumerate(pages, 1))
+    assert stats.result() == expected
+    assert DocumentProcessor().analyze_document_content(PAGE_SEPARATOR.join(pages)) == expected
+
+def test_terms_and_scores():
+    stats = _ContentStats()
+    for page in PAGES:
+        stats.update(page)
+    result = stats.result()
+
+    assert result["tax_keywords_found"] == ["audit", "exemption", "irs", "liability", "return", "tax", "withholding"]
+    assert result["risk_indicators"] == ["adjustment", "deficiency", "penalty"]
+    assert result["contains_financial_data"]
+    assert result["total_characters"] == len(PAGE_SEPARATOR.join(PAGES))
+
+def test_currency_symbol_alone_is_not_financial_data():
+    stats = _ContentStats()
+    stats.update("Send $ signs to the editor")
+
+    assert not stats.result()["contains_financial_data"]
+
+@pytest.fixture
+def long_pdf(tmp_path):
+    path = tmp_path / "long.pdf"
+    doc = pymupdf.open()
+    for number in range(1, 41):
+        doc.new_page().insert_text((72, 72), f"Page {number} tax note")
+    doc.save(str(path))
+    doc.close()
+    return path
+
+def test_broken_extraction_pool_is_replaced(long_pdf, monkeypatch):
+    monkeypatch.setattr(document_processor.os, "cpu_count", lambda: 2)
+    processor = DocumentProcessor()
+    expected = [(number, f"Page {number} tax note\n") for number in range(1, 41)]
+    try:
+        assert processor.extract_pages_from_pdf(long_pdf) == expected
+        
+        # Simulate workers being OOM-killed between uploads
+        broken_pool = processor._extraction_pool
+        for process in list(broken_pool._processes.values()):
+            process.kill()
+            process.join()
+        
+        assert processor.extract_pages_from_pdf(long_pdf) == expected
+        assert processor._extraction_pool is None
+        assert processor.extract_pages_from_pdf(long_pdf) == expected
+        assert processor._extraction_pool not in (None, broken_pool)
+    finally:
+        if processor._extraction_pool is not None:
+            processor._extraction_pool.shutdown()
@@ -0,0 +1,51 @@
+"""
+Tests for EmbeddingCache reuse, batching and dtype handling
+"""
+import numpy as np
+import pytest
+from utils.embedding_cache import EmbeddingCache
+
+class CountingEncoder:
+    """Deterministic fake model that records what it was asked to embed"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(text), text.count("a"), 1.0] for text in texts], dtype=np.float32)
+
+@pytest.fixture
+def cache(tmp_path):
+    return EmbeddingCache(model_name="test-model", cache_dir=tmp_path)
+
+def test_misses_are_embedded_once_and_then_reused(cache):
+    encoder = CountingEncoder()
+    first = cache.embed(["alpha", "beta"], encoder)
+    second = cache.embed(["beta", "alpha", "gamma"], encoder)
+
+    assert encoder.calls == [["alpha", "beta"], ["gamma"]]
+    np.testing.assert_allclose(second[:2], first[::-1])
+    assert (cache.hits, cache.misses) == (2, 3)
+    assert cache.hit_rate == pytest.approx(0.4)
+
+def test_duplicate_texts_in_a_batch_are_embedded_once(cache):
+    encoder = CountingEncoder()
+    embeddings = cache.embed(["same", "other", "same"], encoder)
+
+    assert encoder.calls == [["same", "other"]]
+    np.testing.assert_array_equal(embeddings[0], embeddings[2])
+
+def test_cached_vectors_come_back_as_float32(cache):
+    cache.embed(["alpha"], CountingEncoder())
+    embeddings = cache.embed(["alpha"], CountingEncoder())
+
+    assert embeddings.dtype == np.float32 and embeddings.shape == (1, 3)
+    np.testing.assert_allclose(embeddings[0], [5, 2, 1])
+
+def test_entries_are_per_model(tmp_path):
+    EmbeddingCache(model_name="model-a", cache_dir=tmp_path).embed(["alpha"], CountingEncoder())
+    encoder = CountingEncoder()
+    EmbeddingCache(model_name="model-b", cache_dir=tmp_path).embed(["alpha"], encoder)
+
+    assert encoder.calls == [["alpha"]]
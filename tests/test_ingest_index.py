@@ -0,0 +1,49 @@
+"""
+Tests for the IngestIndex side-index of ingested documents
+"""
+import threading
+from utils.ingest_index import IngestIndex
+
+def test_put_then_get_round_trips(tmp_path):
+    index = IngestIndex(path=tmp_path / ".ingested.json")
+    record = {"metadata": {"filename": "a.pdf"}, "analysis": {"total_words": 3}, "chunk_ids": ["1", "2"]}
+    index.put("abc123", record)
+
+    assert IngestIndex(path=tmp_path / ".ingested.json").get("abc123") == record
+    assert index.get("missing") is None
+
+def test_clear_forgets_everything(tmp_path):
+    index = IngestIndex(path=tmp_path / ".ingested.json")
+    index.put("abc123", {"chunk_ids": []})
+    index.clear()
+
+    assert index.get("abc123") is None
+
+def test_missing_or_corrupt_file_reads_as_empty(tmp_path):
+    path = tmp_path / ".ingested.json"
+    assert IngestIndex(path=path).get("abc123") is None
+
+    path.write_text("{not json", encoding="utf-8")
+    index = IngestIndex(path=path)
+    assert index.get("abc123") is None
+
+    index.put("abc123", {"chunk_ids": ["1"]})
+    assert index.get("abc123") == {"chunk_ids": ["1"]}
+    assert not (tmp_path / ".ingested.json.tmp").exists()
+
+def test_concurrent_puts_keep_every_record(tmp_path):
+    index = IngestIndex(path=tmp_path / ".ingested.json")
+    start = threading.Barrier(8)
+    
+    def ingest(worker):
+        start.wait()
+        for n in range(25):
+            index.put(f"{worker}-{n}", {"chunk_ids": [str(n)]})
+    
+    threads = [threading.Thread(target=ingest, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert all(index.get(f"{worker}-{n}") for worker in range(8) for n in range(25))
@@ -0,0 +1,77 @@
+"""
+Tests for the chromadb private-API guard and INT8/FP32 parity in onnx_embedder
+"""
+from pathlib import Path
+import numpy as np
+import pytest
+from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+from utils.onnx_embedder import OnnxMiniLM, check_chroma_export
+
+MODEL_DIR = Path(ONNXMiniLM_L6_V2.DOWNLOAD_PATH) / ONNXMiniLM_L6_V2.EXTRACTED_FOLDER_NAME
+
+requires_model = pytest.mark.skipif(
+    not (MODEL_DIR / "model.onnx").exists() or not (MODEL_DIR / "tokenizer.json").exists(),
+    reason="MiniLM ONNX export not downloaded"
+)
+
+# Minimum per-text cosine similarity between FP32 and INT8 embeddings
+MIN_PARITY_COSINE = 0.98
+TOP_K = 3
+
+CORPUS = [
+    "The target has an open IRS examination of its 2019 and 2020 federal income tax returns.",
+    "A transfer pricing adjustment proposed by the German tax authority remains under dispute.",
+    "Deferred tax assets of $4.2 million relate to net operating loss carryforwards.",
+    "Section 382 limits the use of NOLs after an ownership change.",
+    "Sales and use tax was not collected in twelve states where nexus exists.",
+    "Payroll withholding deposits were late in Q3, resulting in penalties and interest.",
+    "The company claimed R&D credits without contemporaneous documentation.",
+    "Uncertain tax positions under ASC 740 total $1.8 million including interest.",
+    "The seller indemnifies the buyer for pre-closing taxes through a tax escrow.",
+    "Property tax assessments on the main plant were appealed last year.",
+    "Employees were granted stock options with an exercise price below fair market value.",
+    "The VAT registration in France lapsed and input VAT recovery was denied.",
+]
+
+QUERIES = [
+    "Is there an ongoing tax audit?",
+    "What net operating losses are available and are they limited?",
+    "Are there indirect tax exposures such as sales tax or VAT?",
+    "How is the buyer protected against pre-closing tax liabilities?",
+]
+
+def test_installed_chromadb_provides_export_internals():
+    check_chroma_export(ONNXMiniLM_L6_V2)
+
+def test_missing_internals_fail_loudly():
+    class MovedExport:
+        DOWNLOAD_PATH = "/tmp"
+
+    with pytest.raises(ImportError, match="EXTRACTED_FOLDER_NAME, _download_model_if_not_exists"):
+        check_chroma_export(MovedExport)
+
+@pytest.fixture(scope="module")
+def embedders():
+    fp32 = OnnxMiniLM(quantization="none")
+    int8 = OnnxMiniLM(quantization="int8")
+    fp32.load()
+    int8.load()
+    return fp32, int8
+
+@requires_model
+def test_int8_embeddings_stay_close_to_fp32(embedders):
+    fp32, int8 = embedders
+    texts = CORPUS + QUERIES
+    
+    # Rows are unit length, so the row-wise dot product is the cosine similarity
+    parity = np.sum(fp32.encode(texts) * int8.encode(texts), axis=1)
+    assert parity.min() >= MIN_PARITY_COSINE
+
+@requires_model
+def test_int8_retrieves_the_same_top_k(embedders):
+    for query in QUERIES:
+        rankings = []
+        for embedder in embedders:
+            scores = embedder.encode(CORPUS) @ embedder.encode([query])[0]
+            rankings.append(set(np.argsort(-scores)[:TOP_K]))
+        assert rankings[0] == rankings[1], query
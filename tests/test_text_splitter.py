@@ -0,0 +1,88 @@
+"""
+Tests for FastRecursiveSplitter chunk bounds, overlap, tail folding and streaming
+"""
+import random
+import pytest
+from utils.text_splitter import FastRecursiveSplitter
+
+def _page(rng, paragraphs):
+    """A page of random words in sentences and paragraphs, with no trailing newline"""
+    words = ["tax", "audit", "return", "the", "of", "liability", "deferred", "group", "assessment", "a"]
+    blocks = []
+    for _ in range(paragraphs):
+        lines = []
+        for _ in range(rng.randint(1, 4)):
+            sentences = [" ".join(rng.choices(words, k=rng.randint(3, 30))) for _ in range(rng.randint(1, 5))]
+            lines.append(". ".join(sentences))
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+@pytest.fixture
+def pages():
+    rng = random.Random(7)
+    return [_page(rng, rng.randint(0, 8) or 1) for _ in range(40)]
+
+def test_chunks_never_exceed_chunk_size(pages):
+    splitter = FastRecursiveSplitter(chunk_size=300, chunk_overlap=60, min_size=50)
+    chunks = splitter.split_text("\n\n".join(pages) + " " + "x" * 1000)
+
+    assert chunks
+    assert all(len(chunk) <= 300 for chunk in chunks)
+
+def test_consecutive_chunks_overlap():
+    text = " ".join(f"word{i}" for i in range(400))
+    splitter = FastRecursiveSplitter(chunk_size=200, chunk_overlap=50, min_size=0)
+    chunks = splitter.split_text(text)
+
+    assert len(chunks) > 2
+    for previous, current in zip(chunks, chunks[1:]):
+        carried = current.split(" ")[0]
+        assert carried in previous.split(" ")
+
+def test_no_overlap_reproduces_the_text():
+    text = " ".join(f"word{i}" for i in range(400))
+    splitter = FastRecursiveSplitter(chunk_size=200, chunk_overlap=0, min_size=0)
+
+    assert " ".join(splitter.split_text(text)) == text
+
+def test_tiny_tail_is_folded_into_previous_chunk():
+    text = " ".join(f"w{i:02d}" for i in range(46))
+
+    unfolded = FastRecursiveSplitter(chunk_size=100, chunk_overlap=30, min_size=0).split_text(text)
+    folded = FastRecursiveSplitter(chunk_size=100, chunk_overlap=30, min_size=30).split_text(text)
+
+    assert unfolded[-1] == "w36 w37 w38 w39 w40 w41 w42 w43 w44 w45"
+    assert len(folded) == len(unfolded) - 1
+    assert folded[-1].endswith("w43 w44 w45") and len(folded[-1]) <= 100
+    # Only overlap already present in the chunk before was given up to make room
+    assert folded[-1].startswith("w21") and "w21" in folded[-2]
+
+def test_tail_is_not_folded_past_chunk_size():
+    text = "a" * 150 + "\n\n" + "b" * 20
+    chunks = FastRecursiveSplitter(chunk_size=160, chunk_overlap=0, min_size=50).split_text(text)
+
+    assert chunks == ["a" * 150, "b" * 20]
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(1000, 200), (300, 60), (120, 0)])
+def test_streamed_chunks_match_joined_text(pages, chunk_size, chunk_overlap):
+    splitter = FastRecursiveSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, min_size=50)
+
+    assert list(splitter.split_texts(iter(pages))) == splitter.split_text("\n\n".join(pages))
+
+def test_streamed_chunks_match_for_pages_without_paragraph_breaks():
+    pages = ["first line\nsecond line", "third line\nfourth line", "last\nline"]
+    splitter = FastRecursiveSplitter(chunk_size=30, chunk_overlap=0, min_size=0)
+
+    assert list(splitter.split_texts(pages)) == splitter.split_text("\n\n".join(pages))
+
+def test_streamed_chunks_respect_bounds_when_pages_end_in_newlines(pages):
+    pages = [page + "\n" for page in pages]
+    splitter = FastRecursiveSplitter(chunk_size=300, chunk_overlap=0, min_size=0)
+    chunks = list(splitter.split_texts(pages))
+
+    assert all(len(chunk) <= 300 for chunk in chunks)
+    assert " ".join(chunks).split() == "\n\n".join(pages).split()
+
+def test_overlap_must_be_smaller_than_chunk_size():
+    with pytest.raises(ValueError):
+        FastRecursiveSplitter(chunk_size=100, chunk_overlap=100)
@@ -0,0 +1,101 @@
+"""
+Tests for distance-to-cosine scoring and collection settings in VectorStoreManager
+"""
+import functools
+import chromadb
+import numpy as np
+import pytest
+from chromadb.config import Settings
+import config
+import utils.vector_store as vector_store
+from utils.embedding_cache import EmbeddingCache
+from utils.vector_store import VectorStoreManager, cosine_similarity_from_distance
+from config import COLLECTION_NAME, MIN_RELEVANCE_SCORE
+
+def _unit(*values):
+    vector = np.array(values, dtype=np.float64)
+    return vector / np.linalg.norm(vector)
+
+QUERY = _unit(1, 0, 0)
+
+# Document vectors with known cosine similarity to QUERY
+VECTORS = {
+    "same": _unit(1, 0, 0),
+    "close": _unit(0.6, 0.8, 0),
+    "weak": _unit(0.35, np.sqrt(1 - 0.35 ** 2), 0),
+    "opposite": _unit(-0.9, 0.1, 0.4),
+}
+
+def _client(path):
+    return chromadb.PersistentClient(path=str(path), settings=Settings(anonymized_telemetry=False))
+
+def _add_vectors(collection):
+    collection.add(
+        ids=list(VECTORS),
+        embeddings=[vector.tolist() for vector in VECTORS.values()],
+        documents=list(VECTORS)
+    )
+
+@pytest.mark.parametrize("space", ["l2", "cosine", "ip"])
+def test_distance_converts_to_cosine_similarity(tmp_path, space):
+    collection = _client(tmp_path).create_collection("scores", metadata={"hnsw:space": space})
+    _add_vectors(collection)
+    
+    result = collection.query(query_embeddings=[QUERY.tolist()], n_results=len(VECTORS), include=["distances"])
+    for doc_id, distance in zip(result["ids"][0], result["distances"][0]):
+        expected = float(QUERY @ VECTORS[doc_id])
+        assert cosine_similarity_from_distance(distance, space) == pytest.approx(expected, abs=1e-5)
+
+def test_unknown_space_is_rejected():
+    with pytest.raises(ValueError):
+        cosine_similarity_from_distance(0.5, "hamming")
+
+@pytest.fixture
+def make_manager(tmp_path, monkeypatch):
+    """Build a VectorStoreManager over tmp_path whose query embedding is always QUERY"""
+    monkeypatch.setattr(vector_store, "VECTORDB_DIR", tmp_path)
+    # Keep the embedding cache out of the developer's data/embed_cache
+    embed_cache_dir = tmp_path / "embed_cache"
+    monkeypatch.setattr(config, "EMBED_CACHE_DIR", embed_cache_dir)
+    monkeypatch.setattr(vector_store, "EmbeddingCache", functools.partial(EmbeddingCache, cache_dir=embed_cache_dir))
+    
+    def make():
+        manager = VectorStoreManager()
+        monkeypatch.setattr(manager.embeddings, "embed_query", lambda text: QUERY.tolist())
+        return manager
+    return make
+
+@pytest.mark.parametrize("space", [None, "cosine"])
+def test_scores_are_cosine_similarity_in_either_space(tmp_path, make_manager, space):
+    # None is a collection created before HNSW settings were configured (Chroma's l2 default)
+    _client(tmp_path).create_collection(COLLECTION_NAME, metadata={"hnsw:space": space} if space else None)
+    manager = make_manager()
+    _add_vectors(manager._collection)
+    
+    scores = {doc.page_content: score for doc, score in manager.similarity_search_with_scores("q", k=len(VECTORS))}
+    assert manager.get_index_settings()["space"] == (space or "l2")
+    for doc_id, vector in VECTORS.items():
+        assert scores[doc_id] == pytest.approx(float(QUERY @ vector), abs=1e-5)
+    assert scores["weak"] >= MIN_RELEVANCE_SCORE
+
+def test_existing_collection_settings_are_left_alone(tmp_path, make_manager):
+    _client(tmp_path).create_collection(COLLECTION_NAME)
+    manager = make_manager()
+    
+    assert manager._collection.metadata is None
+    assert manager.get_index_settings() == {"space": "l2", "profile": None}
+
+def test_clear_recreates_collection_with_configured_settings(tmp_path, make_manager):
+    _client(tmp_path).create_collection(COLLECTION_NAME)
+    manager = make_manager()
+    _add_vectors(manager._collection)
+    revision = manager.revision
+    
+    manager.clear_collection()
+    
+    assert manager.get_collection_count() == 0
+    # The LangChain wrapper searches the recreated collection
+    _add_vectors(manager._collection)
+    assert [doc.page_content for doc, _ in manager.similarity_search_with_scores("q", k=1)] == ["same"]
+    assert manager.get_index_settings() == {"space": "cosine", "profile": vector_store.ANN_PROFILE}
+    assert manager.revision == revision + 1
@@ -1,99 +1,297 @@
 """
 Document processing utilities for PDF parsing and text extraction
 """
+import functools
+import hashlib
+import itertools
+import multiprocessing
+import os
+import pickle
 import re
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
-import PyPDF2
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import pymupdf
 from langchain.schema import Document
 from utils.logger import setup_logger
-from config import CHUNK_SIZE, CHUNK_OVERLAP
+from utils.text_splitter import FastRecursiveSplitter
+from config import (
+    CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_MIN_SIZE, CHUNK_STRATEGY, PAGES_PER_CHUNK, PAGE_CHUNK_OVERLAP_RATIO,
+    PARALLEL_EXTRACTION_MIN_PAGES, MAX_EXTRACTION_WORKERS, EXTRACTION_PAGES_PER_TASK, PROCESSING_CACHE_DIR,
+    PROCESSING_CACHE_MAX_ENTRIES
+)
 
 logger = setup_logger("document_processor")
 
+# Our metadata keys -> PyMuPDF document info keys
+PDF_METADATA_KEYS = {
+    "creator": "creator",
+    "producer": "producer",
+    "creation_date": "creationDate",
+    "modification_date": "modDate",
+}
+
+# Any of these marks a document as containing financial data. The words are plain
+# substring checks; only amounts need the regex, and only if "$" or "%" appears at all
+FINANCIAL_TERMS = ("revenue", "profit", "loss", "tax", "liability")
+FINANCIAL_SYMBOLS = ("$", "%")
+FINANCIAL_AMOUNT_PATTERN = re.compile(r'\$[\d,]+|\d+%')
+
+# Pages are joined with this when treated as one text
+PAGE_SEPARATOR = "\n\n"
+
+TAX_KEYWORDS = frozenset({'tax', 'audit', 'liability', 'deduction', 'irs', 'revenue', 'assessment', 'compliance', 'return', 'withholding', 'exemption'})
+RISK_INDICATORS = frozenset({'penalty', 'non-compliance', 'dispute', 'assessment', 'adjustment', 'deficiency', 'examination'})
+
+# Every term searched for; 'assessment' counts towards both lists
+ANALYSIS_TERMS = TAX_KEYWORDS | RISK_INDICATORS
+
+# Bump when processing output changes so stale cached results are ignored
+PROCESSING_CACHE_VERSION = 5
+
+# PDF currently open in an extraction worker process, and the (path, mtime, size) it was opened for
+_worker_doc = None
+_worker_doc_key = None
+
+def _iter_page_texts(doc, start: int, stop: int) -> Iterator[Tuple[int, str]]:
+    """(page number, text) pairs for the non-empty pages in [start, stop)"""
+    for page_index in range(start, stop):
+        text = doc[page_index].get_text("text")
+        if text.strip():
+            yield page_index + 1, text
+
+def _extract_page_range(task: Tuple[Tuple[str, int, int], int, int]) -> List[Tuple[int, str]]:
+    """Extract a slice of pages inside a worker process, reopening the PDF only when the file changes"""
+    global _worker_doc, _worker_doc_key
+    doc_key, start, stop = task
+    if doc_key != _worker_doc_key:
+        if _worker_doc is not None:
+            _worker_doc.close()
+        _worker_doc = pymupdf.open(doc_key[0])
+        _worker_doc_key = doc_key
+    return list(_iter_page_texts(_worker_doc, start, stop))
+
+def _file_digest(file_path: Path) -> str:
+    """BLAKE2b digest of a file's bytes, read in 1 MB chunks"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+@functools.lru_cache(maxsize=32)
+def _load_cached_result(cache_path: str) -> Tuple[Dict, Dict, List[Document]]:
+    """In-memory tier over the on-disk processing cache (failed loads raise, so they aren't memoised)"""
+    with open(cache_path, 'rb') as f:
+        return pickle.load(f)
+
+class _ContentStats:
+    """Running totals for analyze_document_content, fed one page at a time"""
+    
+    def __init__(self):
+        self.parts = 0
+        self.characters = 0
+        self.words = 0
+        self.contains_financial_data = False
+        self.present_terms = set()
+    
+    def update(self, text: str):
+        """Add the next page (as if joined to the previous ones with PAGE_SEPARATOR)"""
+        if self.parts:
+            self.characters += len(PAGE_SEPARATOR)
+        self.parts += 1
+        self.characters += len(text)
+        self.words += len(text.split())
+        
+        # Lowercase once and let str's C substring search do the scanning; terms
+        # contain no whitespace, so none can straddle a page boundary
+        text_lower = text.lower()
+        
+        if not self.contains_financial_data:
+            self.contains_financial_data = (
+                any(term in text_lower for term in FINANCIAL_TERMS)
+                or (any(symbol in text for symbol in FINANCIAL_SYMBOLS) and bool(FINANCIAL_AMOUNT_PATTERN.search(text)))
+            )
+        remaining = ANALYSIS_TERMS - self.present_terms
+        self.present_terms.update(term for term in remaining if term in text_lower)
+    
+    def track(self, pages: Iterable[Tuple[int, str]]) -> Iterator[Tuple[int, str]]:
+        """Pass pages through, updating the totals as each one goes by"""
+        for page in pages:
+            self.update(page[1])
+            yield page
+    
+    def result(self) -> Dict[str, any]:
+        """The analysis dict for everything seen so far"""
+        found_keywords = sorted(self.present_terms & TAX_KEYWORDS)
+        return {
+            "total_characters": self.characters,
+            "total_words": self.words,
+            "estimated_reading_time_minutes": round(self.words / 200, 1),
+            "contains_financial_data": self.contains_financial_data,
+            "tax_keywords_found": found_keywords,
+            "tax_relevance_score": min(len(found_keywords) / len(TAX_KEYWORDS), 1.0),
+            "risk_indicators": sorted(self.present_terms & RISK_INDICATORS)
+        }
+
 class DocumentProcessor:
     """Process and analyze PDF documents for tax risk assessment"""
     
     def __init__(self):
         """Initialize document processor"""
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        self.text_splitter = FastRecursiveSplitter(
             chunk_size=CHUNK_SIZE,
             chunk_overlap=CHUNK_OVERLAP,
-            separators=["\n\n", "\n", ". ", " ", ""]
+            separators=["\n\n", "\n", ". ", " ", ""],
+            min_size=CHUNK_MIN_SIZE
         )
+        self._extraction_pool = None
+        self._extraction_pool_lock = threading.Lock()
         logger.info("DocumentProcessor initialized")
     
-    def extract_text_from_pdf(self, file_path: Path) -> str:
-        """Extract text content from PDF file"""
+    def _get_extraction_pool(self) -> ProcessPoolExecutor:
+        """Extraction process pool, started on first use and shared by every upload"""
+        with self._extraction_pool_lock:
+            if self._extraction_pool is None:
+                # Never fork: the server process runs Tornado, the warm-up thread and
+                # onnxruntime's thread pools, whose locks a forked child would inherit
+                start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._extraction_pool = ProcessPoolExecutor(
+                    max_workers=max(1, min(os.cpu_count() or 1, MAX_EXTRACTION_WORKERS)),
+                    mp_context=multiprocessing.get_context(start_method)
+                )
+            return self._extraction_pool
+    
+    def _discard_extraction_pool(self, pool: ProcessPoolExecutor):
+        """Drop a broken extraction pool so the next parallel extraction starts a fresh one"""
+        with self._extraction_pool_lock:
+            if self._extraction_pool is pool:
+                self._extraction_pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+    
+    @contextmanager
+    def _open(self, file_path: Path) -> Iterator[pymupdf.Document]:
+        """Open a PDF once for both text and metadata extraction"""
+        doc = pymupdf.open(str(file_path))
+        try:
+            yield doc
+        finally:
+            doc.close()
+    
+    def _iter_pages(self, doc: pymupdf.Document, file_path: Path) -> Iterator[Tuple[int, str]]:
+        """Stream (page number, text) pairs for every non-empty page of an open PDF"""
         try:
             logger.info(f"Extracting text from PDF: {file_path.name}")
             
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text_content = []
-                
-                for page_num, page in enumerate(pdf_reader.pages, 1):
-                    text = page.extract_text()
-                    if text.strip():
-                        text_content.append(text)
-                
-                full_text = "\n\n".join(text_content)
-                logger.info(f"Successfully extracted {len(full_text)} characters from {len(pdf_reader.pages)} pages")
-                return full_text
+            page_count = doc.page_count
+            workers = min(os.cpu_count() or 1, MAX_EXTRACTION_WORKERS, page_count)
+            
+            # Small documents aren't worth the process spawn overhead
+            if page_count < PARALLEL_EXTRACTION_MIN_PAGES or workers < 2:
+                extracted = 0
+                for page in _iter_page_texts(doc, 0, page_count):
+                    extracted += 1
+                    yield page
+                logger.info(f"Successfully extracted text from {extracted} of {page_count} pages")
+                return
+            
+            # Pages are independent - extract them in small slices. Workers keep the PDF
+            # open between tasks; the key makes them reopen a rewritten file
+            file_stat = file_path.stat()
+            doc_key = (str(file_path), file_stat.st_mtime_ns, file_stat.st_size)
+            tasks = iter([
+                (doc_key, start, min(start + EXTRACTION_PAGES_PER_TASK, page_count))
+                for start in range(0, page_count, EXTRACTION_PAGES_PER_TASK)
+            ])
+            
+            # Keep only a couple of slices per worker in flight and consume them in page
+            # order, so finished-but-unread pages never pile up beyond that window
+            pool = self._get_extraction_pool()
+            next_page = 0  # first page whose slice hasn't been read yet
+            extracted = 0
+            try:
+                in_flight = deque(pool.submit(_extract_page_range, task) for task in itertools.islice(tasks, 2 * workers))
+                while in_flight:
+                    chunk = in_flight.popleft().result()
+                    next_task = next(tasks, None)
+                    if next_task is not None:
+                        in_flight.append(pool.submit(_extract_page_range, next_task))
+                    next_page = min(next_page + EXTRACTION_PAGES_PER_TASK, page_count)
+                    extracted += len(chunk)
+                    yield from chunk
+            except BrokenProcessPool as e:
+                # A worker died (crash, OOM kill): replace the pool for later uploads
+                # and finish this document in-process from the first unread slice
+                logger.error(f"Extraction pool broke, extracting from page {next_page + 1} in-process: {str(e)}")
+                self._discard_extraction_pool(pool)
+                for page in _iter_page_texts(doc, next_page, page_count):
+                    extracted += 1
+                    yield page
+            
+            logger.info(f"Successfully extracted text from {extracted} of {page_count} pages using {workers} workers")
                 
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {str(e)}")
             raise
     
-    def extract_metadata(self, file_path: Path) -> Dict[str, any]:
-        """Extract metadata from PDF document"""
+    def _extract_metadata(self, doc: pymupdf.Document, file_path: Path) -> Dict[str, any]:
+        """Extract metadata from an open PDF"""
         try:
             logger.info(f"Extracting metadata from: {file_path.name}")
             
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                
-                metadata = {
-                    "filename": file_path.name,
-                    "pages": len(pdf_reader.pages),
-                    "file_size_mb": round(file_path.stat().st_size / (1024 * 1024), 2),
-                }
-                
-                # Extract PDF metadata - convert all to strings
-                if pdf_reader.metadata:
-                    for key in ['creator', 'producer', 'creation_date', 'modification_date']:
-                        value = getattr(pdf_reader.metadata, key, None)
-                        if value is not None:
-                            metadata[key] = str(value)
-                
-                logger.info(f"Metadata extracted: {metadata}")
-                return metadata
+            metadata = {
+                "filename": file_path.name,
+                "pages": doc.page_count,
+                "file_size_mb": round(file_path.stat().st_size / (1024 * 1024), 2),
+            }
+            
+            # Extract PDF metadata under our key names - convert all to strings
+            pdf_metadata = doc.metadata or {}
+            for key, pdf_key in PDF_METADATA_KEYS.items():
+                value = pdf_metadata.get(pdf_key)
+                if value:
+                    metadata[key] = str(value)
+            
+            logger.info(f"Metadata extracted: {metadata}")
+            return metadata
                 
         except Exception as e:
             logger.error(f"Error extracting metadata: {str(e)}")
             return {"filename": file_path.name}
     
+    def extract_pages_from_pdf(self, file_path: Path) -> List[Tuple[int, str]]:
+        """Extract (page number, text) pairs for every non-empty PDF page"""
+        with self._open(file_path) as doc:
+            return list(self._iter_pages(doc, file_path))
+    
+    def extract_text_from_pdf(self, file_path: Path) -> str:
+        """Extract text content from PDF file"""
+        pages = self.extract_pages_from_pdf(file_path)
+        full_text = PAGE_SEPARATOR.join(text for _, text in pages)
+        logger.info(f"Successfully extracted {len(full_text)} characters")
+        return full_text
+    
+    def extract_metadata(self, file_path: Path) -> Dict[str, any]:
+        """Extract metadata from PDF document"""
+        try:
+            with self._open(file_path) as doc:
+                return self._extract_metadata(doc, file_path)
+        except Exception as e:
+            logger.error(f"Error opening PDF for metadata: {str(e)}")
+            return {"filename": file_path.name}
+    
     def analyze_document_content(self, text: str) -> Dict[str, any]:
         """Analyze document content for key information"""
         try:
             logger.info("Analyzing document content")
             
-            analysis = {
-                "total_characters": len(text),
-                "total_words": len(text.split()),
-                "estimated_reading_time_minutes": round(len(text.split()) / 200, 1),
-                "contains_financial_data": bool(re.search(r'\$[\d,]+|\d+%|revenue|profit|loss|tax|liability', text, re.IGNORECASE))
-            }
-            
-            tax_keywords = ['tax', 'audit', 'liability', 'deduction', 'irs', 'revenue', 'assessment', 'compliance', 'return', 'withholding', 'exemption']
-            found_keywords = [kw for kw in tax_keywords if kw.lower() in text.lower()]
-            analysis["tax_keywords_found"] = found_keywords
-            analysis["tax_relevance_score"] = min(len(found_keywords) / len(tax_keywords), 1.0)
-            
-            risk_indicators = ['penalty', 'non-compliance', 'dispute', 'assessment', 'adjustment', 'deficiency', 'examination']
-            found_risks = [ind for ind in risk_indicators if ind.lower() in text.lower()]
-            analysis["risk_indicators"] = found_risks
+            stats = _ContentStats()
+            stats.update(text)
+            analysis = stats.result()
             
             logger.info(f"Document analysis complete")
             return analysis
@@ -102,19 +300,22 @@ class DocumentProcessor:
             logger.error(f"Error analyzing document: {str(e)}")
             return {"error": str(e)}
     
+    def _clean_metadata(self, metadata: Optional[Dict]) -> Dict:
+        """Filter metadata to only include primitive types"""
+        clean_metadata = {}
+        if metadata:
+            for k, v in metadata.items():
+                if isinstance(v, (str, int, float, bool)):
+                    clean_metadata[k] = v
+        return clean_metadata
+    
     def split_into_chunks(self, text: str, metadata: Dict = None) -> List[Document]:
         """Split text into chunks for vector storage"""
         try:
             logger.info(f"Splitting text into chunks (size: {CHUNK_SIZE}, overlap: {CHUNK_OVERLAP})")
             
             chunks = self.text_splitter.split_text(text)
-            
-            # Filter metadata to only include primitive types
-            clean_metadata = {}
-            if metadata:
-                for k, v in metadata.items():
-                    if isinstance(v, (str, int, float, bool)):
-                        clean_metadata[k] = v
+            clean_metadata = self._clean_metadata(metadata)
             
             documents = [
                 Document(
@@ -131,18 +332,130 @@ class DocumentProcessor:
             logger.error(f"Error splitting document: {str(e)}")
             raise
     
-    def process_uploaded_file(self, file_path: Path) -> Tuple[str, Dict, Dict, List[Document]]:
-        """Complete processing pipeline for uploaded file"""
+    def iter_chunks(self, texts: Iterable[str], metadata: Dict = None) -> Iterator[Document]:
+        """Stream chunks of consecutive texts (e.g. pages) as the splitter fills each one"""
+        try:
+            logger.info(f"Streaming text into chunks (size: {CHUNK_SIZE}, overlap: {CHUNK_OVERLAP})")
+            
+            clean_metadata = self._clean_metadata(metadata)
+            chunk_count = 0
+            for chunk in self.text_splitter.split_texts(texts, joiner=PAGE_SEPARATOR):
+                yield Document(
+                    page_content=chunk,
+                    metadata={**clean_metadata, "chunk_index": chunk_count}
+                )
+                chunk_count += 1
+            
+            logger.info(f"Created {chunk_count} document chunks")
+            
+        except Exception as e:
+            logger.error(f"Error splitting document: {str(e)}")
+            raise
+    
+    def split_into_page_chunks(self, pages: Iterable[Tuple[int, str]], metadata: Dict = None) -> List[Document]:
+        """Split pages into one chunk per group of consecutive pages"""
+        try:
+            logger.info(f"Splitting pages into chunks ({PAGES_PER_CHUNK} pages, {PAGE_CHUNK_OVERLAP_RATIO:.0%} overlap)")
+            
+            clean_metadata = self._clean_metadata(metadata)
+            documents = []
+            previous_text = ""
+            
+            page_iter = iter(pages)
+            while True:
+                group = list(itertools.islice(page_iter, PAGES_PER_CHUNK))
+                if not group:
+                    break
+                group_text = PAGE_SEPARATOR.join(text for _, text in group)
+                
+                # Carry the tail of the previous group so context spanning the boundary is kept
+                overlap_chars = int(len(previous_text) * PAGE_CHUNK_OVERLAP_RATIO)
+                overlap = previous_text[len(previous_text) - overlap_chars:]
+                
+                documents.append(Document(
+                    page_content=f"{overlap}\n\n{group_text}" if overlap else group_text,
+                    metadata={
+                        **clean_metadata,
+                        "chunk_index": len(documents),
+                        "page_start": group[0][0],
+                        "page_end": group[-1][0]
+                    }
+                ))
+                previous_text = group_text
+            
+            logger.info(f"Created {len(documents)} page chunks")
+            return documents
+            
+        except Exception as e:
+            logger.error(f"Error splitting document by pages: {str(e)}")
+            raise
+    
+    def _cache_path(self, file_path: Path, doc_hash: Optional[str] = None) -> Path:
+        """Processing cache entry for this file's content, name and chunking settings"""
+        settings = f"{file_path.name}|{CHUNK_STRATEGY}|{CHUNK_SIZE}|{CHUNK_OVERLAP}|{CHUNK_MIN_SIZE}|{PAGES_PER_CHUNK}|{PAGE_CHUNK_OVERLAP_RATIO}|v{PROCESSING_CACHE_VERSION}"
+        content_hash = doc_hash or _file_digest(file_path)
+        key = hashlib.blake2b(f"{content_hash}|{settings}".encode("utf-8"), digest_size=16).hexdigest()
+        return PROCESSING_CACHE_DIR / f"{key}.pkl"
+    
+    def _evict_cached_results(self):
+        """Delete the least recently used cache entries beyond PROCESSING_CACHE_MAX_ENTRIES"""
+        try:
+            entries = sorted(PROCESSING_CACHE_DIR.glob("*.pkl"), key=lambda path: path.stat().st_mtime, reverse=True)
+            for stale_path in entries[PROCESSING_CACHE_MAX_ENTRIES:]:
+                stale_path.unlink(missing_ok=True)
+                logger.info(f"Evicted processing cache entry {stale_path.name}")
+        except Exception as e:
+            logger.error(f"Error evicting processing cache: {str(e)}")
+    
+    def _save_cached_result(self, cache_path: Path, result: Tuple):
+        """Write a processing result atomically; a failed write only costs a future cache miss"""
+        try:
+            tmp_path = cache_path.with_suffix(".tmp")
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            logger.error(f"Error writing processing cache: {str(e)}")
+            return
+        self._evict_cached_results()
+    
+    def process_uploaded_file(self, file_path: Path, doc_hash: Optional[str] = None) -> Tuple[Dict, Dict, List[Document]]:
+        """Complete processing pipeline for uploaded file; doc_hash, if given, saves re-hashing its content"""
         try:
             logger.info(f"Starting complete processing for: {file_path.name}")
             
-            text = self.extract_text_from_pdf(file_path)
-            metadata = self.extract_metadata(file_path)
-            analysis = self.analyze_document_content(text)
-            chunks = self.split_into_chunks(text, metadata)
+            cache_path = self._cache_path(file_path, doc_hash)
+            if cache_path.exists():
+                try:
+                    result = _load_cached_result(str(cache_path))
+                    # Refresh the mtime so eviction treats this entry as recently used
+                    os.utime(cache_path)
+                    logger.info(f"Loaded cached processing result for {file_path.name}")
+                    return result
+                except Exception as e:
+                    logger.error(f"Ignoring unreadable processing cache: {str(e)}")
+            
+            # One open serves both text and metadata extraction. Pages stream straight into
+            # the analysis and the splitter, so the full text is never materialised; at most
+            # 2 * workers * EXTRACTION_PAGES_PER_TASK pages are held at once when extracting in parallel
+            with self._open(file_path) as doc:
+                metadata = self._extract_metadata(doc, file_path)
+                stats = _ContentStats()
+                pages = stats.track(self._iter_pages(doc, file_path))
+                
+                if CHUNK_STRATEGY == "pages":
+                    chunks = self.split_into_page_chunks(pages, metadata)
+                else:
+                    chunks = list(self.iter_chunks((page_text for _, page_text in pages), metadata))
+            
+            logger.info("Analyzing document content")
+            analysis = stats.result()
+            
+            result = (metadata, analysis, chunks)
+            self._save_cached_result(cache_path, result)
             
             logger.info(f"Processing complete for {file_path.name}")
-            return text, metadata, analysis, chunks
+            return result
             
         except Exception as e:
             logger.error(f"Error in processing pipeline: {str(e)}")
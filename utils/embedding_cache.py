@@ -0,0 +1,71 @@
+"""
+Persistent embedding cache keyed by chunk content hash
+"""
+import hashlib
+from pathlib import Path
+from typing import Callable, Dict, List
+import numpy as np
+import diskcache
+from utils.logger import setup_logger
+from config import EMBED_CACHE_DIR, EMBEDDING_MODEL, EMBED_CACHE_DTYPE
+
+logger = setup_logger("embedding_cache")
+
+class EmbeddingCache:
+    """Disk-backed cache that skips re-embedding identical chunk text"""
+    
+    def __init__(self, model_name: str = EMBEDDING_MODEL, cache_dir: Path = EMBED_CACHE_DIR):
+        """Open the on-disk cache for the given embedding model"""
+        self.model_name = model_name
+        # Vectors are stored compactly on disk and widened back to float32 on load
+        self.dtype = np.dtype(EMBED_CACHE_DTYPE)
+        self.cache = diskcache.Cache(str(cache_dir))
+        self.hits = 0
+        self.misses = 0
+        logger.info(f"EmbeddingCache opened at {cache_dir}")
+    
+    def _key(self, text: str) -> str:
+        """Cache key for a text embedded with the current model and storage dtype"""
+        return hashlib.sha256(f"{self.model_name}|{self.dtype.name}|{text}".encode("utf-8")).hexdigest()
+    
+    def embed(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Return an (n, dim) float32 array for texts, calling encode_fn only for cache misses"""
+        keys = [self._key(text) for text in texts]
+        cached_vectors: Dict[int, np.ndarray] = {}
+        misses: Dict[str, List[int]] = {}
+        
+        for idx, key in enumerate(keys):
+            cached = self.cache.get(key)
+            if cached is None:
+                misses.setdefault(key, []).append(idx)
+            else:
+                cached_vectors[idx] = np.frombuffer(cached, dtype=self.dtype)
+        
+        miss_count = sum(len(idxs) for idxs in misses.values())
+        self.hits += len(texts) - miss_count
+        self.misses += miss_count
+        
+        new_vectors = None
+        if misses:
+            # Identical texts within the batch are embedded only once
+            miss_keys = list(misses)
+            new_vectors = encode_fn([texts[misses[key][0]] for key in miss_keys])
+            for key, vector in zip(miss_keys, new_vectors):
+                self.cache[key] = vector.astype(self.dtype).tobytes()
+        
+        dim = new_vectors.shape[1] if new_vectors is not None else len(next(iter(cached_vectors.values()), ()))
+        embeddings = np.empty((len(texts), dim), dtype=np.float32)
+        for idx, vector in cached_vectors.items():
+            embeddings[idx] = vector
+        if new_vectors is not None:
+            for key, vector in zip(misses, new_vectors):
+                embeddings[misses[key]] = vector
+        
+        logger.info(f"Embedding cache: {len(texts) - miss_count} reused, {len(misses)} embedded")
+        return embeddings
+    
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
@@ -0,0 +1,57 @@
+"""
+Side-index of already-ingested documents keyed by content hash
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+from utils.logger import setup_logger
+from config import INGESTED_INDEX_PATH
+
+logger = setup_logger("ingest_index")
+
+class IngestIndex:
+    """Map document content hashes to their metadata, analysis and chunk ids"""
+    
+    def __init__(self, path: Path = INGESTED_INDEX_PATH):
+        self.path = path
+        # One instance is shared by every session; writes are read-modify-write of the
+        # whole file, so they are serialised to keep concurrent ingests from losing records
+        self._write_lock = threading.Lock()
+    
+    def _load(self) -> Dict[str, Dict]:
+        """Read the index from disk, treating a missing or corrupt file as empty"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading ingest index: {str(e)}")
+            return {}
+    
+    def _save(self, entries: Dict[str, Dict]):
+        """Write the index atomically so readers never see a partial file"""
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+    
+    def get(self, doc_hash: str) -> Optional[Dict]:
+        """Return the ingestion record for a document hash, if any"""
+        return self._load().get(doc_hash)
+    
+    def put(self, doc_hash: str, record: Dict):
+        """Record a newly ingested document"""
+        with self._write_lock:
+            entries = self._load()
+            entries[doc_hash] = record
+            self._save(entries)
+        logger.info(f"Recorded ingested document {doc_hash[:12]}")
+    
+    def clear(self):
+        """Forget all ingested documents"""
+        with self._write_lock:
+            self._save({})
+        logger.info("Ingest index cleared")
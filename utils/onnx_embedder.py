@@ -0,0 +1,108 @@
+"""
+MiniLM sentence embeddings on ONNX Runtime with INT8-quantized weights
+"""
+import os
+from pathlib import Path
+from typing import List
+import numpy as np
+import chromadb
+import onnxruntime
+from tokenizers import Tokenizer
+from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+from utils.logger import setup_logger
+from config import EMBED_BATCH_SIZE, EMBEDDING_QUANTIZATION
+
+logger = setup_logger("onnx_embedder")
+
+# Private parts of Chroma's ONNX embedding function used to locate and download the export
+# (present in chromadb 0.4.x; checked at import so an upgrade that drops them fails here)
+CHROMA_EXPORT_ATTRIBUTES = ("DOWNLOAD_PATH", "EXTRACTED_FOLDER_NAME", "_download_model_if_not_exists")
+
+def check_chroma_export(export_cls=ONNXMiniLM_L6_V2):
+    """Raise ImportError if this chromadb's ONNX embedding function lacks the internals we rely on"""
+    missing = [name for name in CHROMA_EXPORT_ATTRIBUTES if not hasattr(export_cls, name)]
+    if missing:
+        raise ImportError(
+            f"chromadb {chromadb.__version__} {export_cls.__name__} lacks {', '.join(missing)}; "
+            f"onnx_embedder supports chromadb 0.4.x"
+        )
+
+check_chroma_export()
+
+class OnnxMiniLM:
+    """all-MiniLM-L6-v2 served from Chroma's ONNX export, optionally quantized to INT8"""
+    
+    MAX_TOKENS = 256
+    
+    def __init__(self, quantization: str = EMBEDDING_QUANTIZATION):
+        """Prepare the embedder; weights are loaded by load()"""
+        self.quantization = quantization
+        self._export = ONNXMiniLM_L6_V2()
+        self.model_dir = Path(ONNXMiniLM_L6_V2.DOWNLOAD_PATH) / ONNXMiniLM_L6_V2.EXTRACTED_FOLDER_NAME
+        self.tokenizer = None
+        self.session = None
+    
+    def _quantized_model_path(self) -> Path:
+        """Quantize the FP32 export to INT8 once and reuse the result"""
+        int8_path = self.model_dir / "model-int8.onnx"
+        if not int8_path.exists():
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            logger.info("Quantizing MiniLM ONNX model to INT8")
+            tmp_path = self.model_dir / "model-int8.tmp.onnx"
+            quantize_dynamic(str(self.model_dir / "model.onnx"), str(tmp_path), weight_type=QuantType.QInt8)
+            os.replace(tmp_path, int8_path)
+        return int8_path
+    
+    def load(self):
+        """Fetch the ONNX export if needed and open the tokenizer and inference session"""
+        # Chroma downloads and verifies the FP32 export for us
+        self._export._download_model_if_not_exists()
+        
+        model_path = self.model_dir / "model.onnx"
+        providers = onnxruntime.get_available_providers()
+        if self.quantization == "int8":
+            try:
+                model_path = self._quantized_model_path()
+                # Dynamically quantized INT8 kernels (VNNI on AVX-512 hosts) are CPU-only
+                providers = ["CPUExecutionProvider"]
+            except Exception as e:
+                logger.error(f"INT8 quantization failed, using FP32 model: {str(e)}")
+        
+        tokenizer = Tokenizer.from_file(str(self.model_dir / "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=self.MAX_TOKENS)
+        # Pad to the longest text in each batch rather than always to MAX_TOKENS
+        tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+        
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(str(model_path), sess_options=options, providers=providers)
+        self.tokenizer = tokenizer
+        logger.info(f"Loaded {model_path.name} on {providers[0]}")
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in batches as one contiguous (n, dim) float32 array of L2-normalized rows"""
+        batches = []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            encoded = self.tokenizer.encode_batch(texts[start:start + EMBED_BATCH_SIZE])
+            input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+            
+            last_hidden_state = self.session.run(None, {
+                "input_ids": input_ids,
+                "attention_mask": attention_mask,
+                "token_type_ids": np.zeros_like(input_ids)
+            })[0]
+            
+            # Attention-weighted mean pooling, then L2 normalization
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (last_hidden_state * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            batches.append(pooled.astype(np.float32))
+        
+        if not batches:
+            return np.empty((0, self.session.get_outputs()[0].shape[-1]), dtype=np.float32)
+        return np.ascontiguousarray(np.concatenate(batches))
+    
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts as Python lists (Chroma's embedding function interface)"""
+        return self.encode(texts).tolist()
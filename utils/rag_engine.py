@@ -1,18 +1,75 @@
 """
 RAG engine using direct Groq API calls
 """
-from typing import List, Dict, Optional
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+import httpx
 import requests
-from langchain.chains import RetrievalQA
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from langchain.llms.base import LLM
-from langchain.prompts import PromptTemplate
 from langchain.callbacks.manager import CallbackManagerForLLMRun
+from langchain.schema import Document
 from utils.logger import setup_logger
 from utils.vector_store import VectorStoreManager
-from config import LLM_MODEL, TEMPERATURE, MAX_TOKENS, TOP_K_RESULTS, GROQ_API_KEY
+from config import LLM_MODEL, TEMPERATURE, MAX_TOKENS, TOP_K_RESULTS, MIN_RELEVANCE_SCORE, GROQ_API_KEY, ANSWER_CACHE_SIZE
 
 logger = setup_logger("rag_engine")
 
+GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+
+# Answer given without calling the LLM when retrieval finds nothing relevant
+NOT_FOUND_ANSWER = "I cannot find this information in the provided document."
+
+# Sources carry at most this much of their chunk; reports and the UI slice further from it
+SOURCE_SNIPPET_CHARS = 300
+
+def format_snippet(source: Dict, max_chars: int) -> str:
+    """A source's snippet cut to max_chars, ending in "..." only if chunk text was left out"""
+    snippet = source["snippet"]
+    if source["truncated"] or len(snippet) > max_chars:
+        return snippet[:max_chars] + "..."
+    return snippet
+
+# GroqHTTP and GroqAsync report failures as answer text starting with one of these
+LLM_ERROR_PREFIXES = ("API Error:", "Request failed:", "Invalid response:")
+
+# One pooled keep-alive session so each call skips a fresh TCP+TLS handshake
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset({"POST"}),
+        raise_on_status=False
+    )
+))
+
+def _groq_headers() -> Dict[str, str]:
+    """Request headers for the Groq chat completions API"""
+    return {
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Content-Type": "application/json",
+        "Connection": "keep-alive"
+    }
+
+def _groq_payload(prompt: str) -> Dict:
+    """Chat completion request body for a single-turn prompt"""
+    return {
+        "model": LLM_MODEL,
+        "messages": [
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": TEMPERATURE,
+        "max_tokens": MAX_TOKENS
+    }
+
 class GroqHTTP(LLM):
     """Direct Groq API via HTTP"""
     
@@ -23,23 +80,8 @@ class GroqHTTP(LLM):
     def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs) -> str:
         """Call Groq API with proper error handling"""
         
-        url = "https://api.groq.com/openai/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {GROQ_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": LLM_MODEL,
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": TEMPERATURE,
-            "max_tokens": MAX_TOKENS
-        }
-        
         try:
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
+            response = _SESSION.post(GROQ_API_URL, json=_groq_payload(prompt), headers=_groq_headers(), timeout=30)
             
             # Log the error details
             if response.status_code != 200:
@@ -56,6 +98,44 @@ class GroqHTTP(LLM):
             logger.error(f"Invalid response format: {str(e)}")
             return f"Invalid response: {str(e)}"
 
+class GroqAsync:
+    """Async Groq API client; concurrent calls share one HTTP/2 connection"""
+    
+    MAX_RETRIES = 3
+    BACKOFF_SECONDS = 0.3
+    
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+    
+    @staticmethod
+    def create_client() -> httpx.AsyncClient:
+        """HTTP client for one event loop (httpx clients can't be shared across loops)"""
+        return httpx.AsyncClient(http2=True, timeout=30, limits=httpx.Limits(max_connections=32))
+    
+    async def acall(self, prompt: str) -> str:
+        """Call Groq API with the same retry and error handling as GroqHTTP"""
+        try:
+            for attempt in range(self.MAX_RETRIES + 1):
+                response = await self.client.post(GROQ_API_URL, json=_groq_payload(prompt), headers=_groq_headers())
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.MAX_RETRIES:
+                    break
+                await asyncio.sleep(self.BACKOFF_SECONDS * 2 ** attempt)
+            
+            # Log the error details
+            if response.status_code != 200:
+                logger.error(f"Groq API error: {response.status_code} - {response.text}")
+                return f"API Error: {response.status_code} - {response.text}"
+            
+            result = response.json()
+            return result["choices"][0]["message"]["content"]
+            
+        except httpx.HTTPError as e:
+            logger.error(f"Request failed: {str(e)}")
+            return f"Request failed: {str(e)}"
+        except (KeyError, IndexError) as e:
+            logger.error(f"Invalid response format: {str(e)}")
+            return f"Invalid response: {str(e)}"
+
 class RAGEngine:
     """RAG-based question answering system"""
     
@@ -80,20 +160,15 @@ Provide a detailed answer. If the information is not in the context, state "I ca
 
 Answer:"""
             
-            self.qa_chain = RetrievalQA.from_chain_type(
-                llm=self.llm,
-                chain_type="stuff",
-                retriever=self.vector_store.vector_store.as_retriever(
-                    search_kwargs={"k": TOP_K_RESULTS}
-                ),
-                chain_type_kwargs={
-                    "prompt": PromptTemplate(
-                        template=prompt_template,
-                        input_variables=["context", "question"]
-                    )
-                },
-                return_source_documents=True
-            )
+            # Plain str.format on the hot path; no per-query chain or template parsing
+            self._prompt_fmt = prompt_template
+            
+            # LRU of successful answers keyed by (question, vector store revision)
+            self._answer_cache: "OrderedDict[Tuple[str, int], Dict]" = OrderedDict()
+            self._answer_cache_lock = threading.Lock()
+            
+            # Retrievals for the current analysis run, keyed like the answer cache
+            self._retrieval_cache: Dict[Tuple[str, int], List[Tuple[Document, float]]] = {}
             
             logger.info("RAGEngine initialized successfully")
             
@@ -101,6 +176,32 @@ Answer:"""
             logger.error(f"Error initializing RAGEngine: {str(e)}")
             raise
     
+    def _cache_key(self, question: str) -> Tuple[str, int]:
+        """Whitespace-normalized question plus the vector store revision it was answered against"""
+        return (" ".join(question.split()), self.vector_store.revision)
+    
+    def clear_retrieval_cache(self):
+        """Forget retrievals from a previous analysis run"""
+        self._retrieval_cache.clear()
+    
+    def _get_cached_answer(self, cache_key: Tuple[str, int]) -> Optional[Dict]:
+        """Look up a cached answer, marking it most recently used"""
+        with self._answer_cache_lock:
+            response = self._answer_cache.get(cache_key)
+            if response is not None:
+                self._answer_cache.move_to_end(cache_key)
+            return response
+    
+    def _cache_answer(self, cache_key: Tuple[str, int], response: Dict):
+        """Remember a successful answer, evicting the least recently used"""
+        if response["answer"].startswith(LLM_ERROR_PREFIXES):
+            return
+        with self._answer_cache_lock:
+            self._answer_cache[cache_key] = response
+            self._answer_cache.move_to_end(cache_key)
+            while len(self._answer_cache) > ANSWER_CACHE_SIZE:
+                self._answer_cache.popitem(last=False)
+    
     def query(self, question: str) -> Dict:
         """Query the RAG system"""
         try:
@@ -112,18 +213,19 @@ Answer:"""
                     "sources": []
                 }
             
-            result = self.qa_chain({"query": question})
-            
-            response = {
-                "answer": result["result"],
-                "sources": [
-                    {
-                        "content": doc.page_content[:300] + "..." if len(doc.page_content) > 300 else doc.page_content,
-                        "metadata": doc.metadata
-                    }
-                    for doc in result.get("source_documents", [])
-                ]
-            }
+            # Answers stay valid until the indexed documents change
+            cache_key = self._cache_key(question)
+            cached = self._get_cached_answer(cache_key)
+            if cached is not None:
+                logger.info("Answer served from cache")
+                return cached
+            
+            prompt, docs = self._build_prompt(question)
+            if prompt is None:
+                response = {"answer": NOT_FOUND_ANSWER, "sources": []}
+            else:
+                response = self._build_response(self.llm._call(prompt), docs)
+            self._cache_answer(cache_key, response)
             
             logger.info(f"Query processed successfully")
             return response
@@ -133,4 +235,75 @@ Answer:"""
             return {
                 "answer": f"❌ Error: {str(e)}",
                 "sources": []
-            }
\ No newline at end of file
+            }
+    
+    async def aquery(self, question: str, llm: GroqAsync) -> Dict:
+        """Async variant of query: retrieval runs inline, only the Groq call is awaited"""
+        try:
+            logger.info(f"Processing async query: '{question}'")
+            
+            if not GROQ_API_KEY:
+                return {
+                    "answer": "⚠️ Groq API key not configured. Set GROQ_API_KEY in .env file.",
+                    "sources": []
+                }
+            
+            cache_key = self._cache_key(question)
+            cached = self._get_cached_answer(cache_key)
+            if cached is not None:
+                logger.info("Answer served from cache")
+                return cached
+            
+            prompt, docs = self._build_prompt(question)
+            if prompt is None:
+                response = {"answer": NOT_FOUND_ANSWER, "sources": []}
+            else:
+                response = self._build_response(await llm.acall(prompt), docs)
+            self._cache_answer(cache_key, response)
+            
+            logger.info(f"Async query processed successfully")
+            return response
+            
+        except Exception as e:
+            logger.error(f"Error processing async query: {str(e)}")
+            return {
+                "answer": f"❌ Error: {str(e)}",
+                "sources": []
+            }
+    
+    def _build_prompt(self, question: str) -> Tuple[Optional[str], List[Document]]:
+        """Retrieve context for a question and format the prompt ("stuff" layout)"""
+        cache_key = self._cache_key(question)
+        scored_docs = self._retrieval_cache.get(cache_key)
+        if scored_docs is None:
+            scored_docs = self.vector_store.similarity_search_with_scores(question, k=TOP_K_RESULTS)
+            if len(self._retrieval_cache) >= ANSWER_CACHE_SIZE:
+                self._retrieval_cache.clear()
+            self._retrieval_cache[cache_key] = scored_docs
+        
+        # No prompt when even the best match is irrelevant - the LLM could only say it can't find it
+        if not scored_docs or max(score for _, score in scored_docs) < MIN_RELEVANCE_SCORE:
+            logger.info("No relevant context found, skipping LLM call")
+            return None, []
+        
+        # Boilerplate chunks often repeat verbatim; put each distinct text in the prompt once
+        unique_docs = {}
+        for doc, _ in scored_docs:
+            unique_docs.setdefault(doc.page_content, doc)
+        docs = list(unique_docs.values())
+        context = "\n\n".join(doc.page_content for doc in docs)
+        return self._prompt_fmt.format(context=context, question=question), docs
+    
+    def _build_response(self, answer: str, source_documents: List[Document]) -> Dict:
+        """Package an answer with truncated source snippets"""
+        return {
+            "answer": answer,
+            "sources": [
+                {
+                    "snippet": doc.page_content[:SOURCE_SNIPPET_CHARS],
+                    "truncated": len(doc.page_content) > SOURCE_SNIPPET_CHARS,
+                    "metadata": doc.metadata
+                }
+                for doc in source_documents
+            ]
+        }
\ No newline at end of file
@@ -1,9 +1,11 @@
 """
 Automated tax risk analysis and reporting
 """
+import asyncio
 from typing import Dict, List
 from utils.logger import setup_logger
-from utils.rag_engine import RAGEngine
+from utils.rag_engine import GroqAsync, RAGEngine, format_snippet
+from config import GROQ_MAX_CONCURRENCY
 
 logger = setup_logger("tax_analyzer")
 
@@ -17,6 +19,7 @@ class TaxAnalyzer:
         """Run comprehensive tax analysis across all sections"""
         
         logger.info("Starting comprehensive tax analysis")
+        self.rag.clear_retrieval_cache()
         
         # Define analysis questions for each section
         analysis_sections = {
@@ -60,6 +63,11 @@ class TaxAnalyzer:
             ]
         }
         
+        # Each query is dominated by the Groq round trip, so run the unique
+        # questions concurrently and assemble the sections afterwards
+        unique_questions = list(dict.fromkeys(q for questions in analysis_sections.values() for q in questions))
+        responses = asyncio.run(self._query_all(unique_questions))
+        
         report = {}
         
         for section, questions in analysis_sections.items():
@@ -67,7 +75,7 @@ class TaxAnalyzer:
             section_results = []
             
             for question in questions:
-                response = self.rag.query(question)
+                response = responses[question]
                 section_results.append({
                     "question": question,
                     "answer": response["answer"],
@@ -79,6 +87,21 @@ class TaxAnalyzer:
         logger.info("Tax analysis complete")
         return report
     
+    async def _query_all(self, questions: List[str]) -> Dict[str, Dict]:
+        """Ask every question concurrently over one shared HTTP/2 client"""
+        semaphore = asyncio.Semaphore(GROQ_MAX_CONCURRENCY)
+        
+        async with GroqAsync.create_client() as client:
+            llm = GroqAsync(client)
+            
+            async def ask(question: str) -> Dict:
+                async with semaphore:
+                    return await self.rag.aquery(question, llm)
+            
+            answers = await asyncio.gather(*(ask(question) for question in questions))
+        
+        return dict(zip(questions, answers))
+    
     def generate_summary_report(self, analysis: Dict) -> str:
         """Generate formatted summary report"""
         
@@ -106,7 +129,7 @@ class TaxAnalyzer:
                     if item['sources']:
                         report += "_Sources:_\n"
                         for idx, source in enumerate(item['sources'][:2], 1):
-                            report += f"- Source {idx}: {source['content'][:150]}...\n"
+                            report += f"- Source {idx}: {format_snippet(source, 150)}\n"
                         report += "\n"
             
             report += "---\n"
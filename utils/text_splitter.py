@@ -0,0 +1,122 @@
+"""
+Split-then-merge recursive text splitter
+"""
+from collections import deque
+from typing import Iterable, Iterator, List
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
+
+class FastRecursiveSplitter:
+    """Recursive character splitter: one split pass down the separator cascade, one greedy merge pass"""
+    
+    def __init__(self, chunk_size: int, chunk_overlap: int = 0, separators: List[str] = None, min_size: int = 100):
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or DEFAULT_SEPARATORS
+        self.min_size = min_size
+    
+    def _segments(self, text: str, separators: List[str], force: bool = False) -> List[str]:
+        """Split text into pieces no longer than chunk_size, each keeping its trailing separator"""
+        # force treats text as one part of a longer text, so it is split at the top separator even
+        # when short; a part without that separator would be a single piece of the longer text
+        if force and separators[0] not in text:
+            return self._segments(text, separators[1:])
+        if len(text) <= self.chunk_size and not force:
+            return [text]
+        
+        for i, separator in enumerate(separators):
+            if separator == "":
+                break
+            if separator not in text:
+                continue
+            
+            pieces = text.split(separator)
+            segments = []
+            for j, piece in enumerate(pieces):
+                if j < len(pieces) - 1:
+                    piece += separator
+                if not piece:
+                    continue
+                if len(piece) <= self.chunk_size:
+                    segments.append(piece)
+                else:
+                    segments.extend(self._segments(piece, separators[i + 1:]))
+            return segments
+        
+        # No separator left - hard cut
+        return [text[start:start + self.chunk_size] for start in range(0, len(text), self.chunk_size)]
+    
+    def _stream_segments(self, texts: Iterable[str], joiner: str) -> Iterator[str]:
+        """Segments of joiner.join(texts), produced one text at a time"""
+        previous = None
+        for text in texts:
+            if previous is not None:
+                # Split each page as a part of the joined text. When the joiner is the top separator
+                # the chunks match split_text's, unless a page's trailing characters run into the
+                # joiner (e.g. a page ending in "\n"); then cut points can shift, but chunks still
+                # respect chunk_size and together cover the same text
+                yield from self._segments(previous + joiner, self.separators, force=True)
+            previous = text
+        if previous is not None:
+            yield from self._segments(previous, self.separators, force=True)
+    
+    def _merge(self, segments: Iterable[str]) -> Iterator[str]:
+        """Greedily merge segments into chunks, yielding each chunk once the next one starts"""
+        window = deque()
+        window_len = 0
+        fresh = 0  # segments in the window that aren't carried-over overlap
+        previous = None  # segments of the last completed chunk, and how many it carried over
+        previous_carried = 0
+        
+        for segment in segments:
+            if window and window_len + len(segment) > self.chunk_size:
+                if previous is not None:
+                    yield from self._emit(previous)
+                previous = list(window)
+                previous_carried = len(window) - fresh
+                # Keep the trailing segments that fit in the overlap budget
+                while window and (window_len > self.chunk_overlap or window_len + len(segment) > self.chunk_size):
+                    window_len -= len(window.popleft())
+                fresh = 0
+            window.append(segment)
+            window_len += len(segment)
+            fresh += 1
+        
+        if window:
+            tail = list(window)[len(window) - fresh:]
+            tail_len = sum(len(part) for part in tail)
+            if previous is not None and len("".join(tail).strip()) < self.min_size:
+                # Fold a tiny final chunk into its predecessor rather than emitting a near-empty chunk,
+                # dropping as much of the predecessor's carried-over overlap (already in the chunk
+                # before it) as needed to stay within chunk_size
+                previous_len = sum(len(part) for part in previous)
+                dropped = 0
+                while dropped < previous_carried and previous_len + tail_len > self.chunk_size:
+                    previous_len -= len(previous[dropped])
+                    dropped += 1
+                if previous_len + tail_len <= self.chunk_size:
+                    yield from self._emit(previous[dropped:] + tail)
+                    return
+            if previous is not None:
+                yield from self._emit(previous)
+            previous = list(window)
+        
+        if previous is not None:
+            yield from self._emit(previous)
+    
+    @staticmethod
+    def _emit(segments: List[str]) -> Iterator[str]:
+        """The stripped chunk made of segments, unless it is blank"""
+        chunk = "".join(segments).strip()
+        if chunk:
+            yield chunk
+    
+    def split_text(self, text: str) -> List[str]:
+        """Split text into chunks of at most chunk_size characters with chunk_overlap carried over"""
+        return list(self._merge(self._segments(text, self.separators)))
+    
+    def split_texts(self, texts: Iterable[str], joiner: str = "\n\n") -> Iterator[str]:
+        """Stream chunks of joiner.join(texts) without ever building the joined string"""
+        return self._merge(self._stream_segments(texts, joiner))
@@ -1,32 +1,79 @@
 """
 Vector database management using ChromaDB
 """
-from typing import List, Optional
+import functools
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 from pathlib import Path
+import numpy as np
 import chromadb
 from chromadb.config import Settings
 from langchain_community.vectorstores import Chroma
 from langchain.schema import Document
 from langchain.embeddings.base import Embeddings
+from utils.embedding_cache import EmbeddingCache
+from utils.onnx_embedder import OnnxMiniLM
 from utils.logger import setup_logger
-from config import VECTORDB_DIR, COLLECTION_NAME
+from config import (
+    VECTORDB_DIR, COLLECTION_NAME, QUERY_EMBEDDING_CACHE_SIZE, INGEST_BATCH_SIZE,
+    EMBEDDING_MODEL, EMBEDDING_QUANTIZATION,
+    ANN_PROFILE, ANN_SEARCH_EF, HNSW_SPACE, HNSW_CONSTRUCTION_EF, HNSW_M
+)
 
 logger = setup_logger("vector_store")
 
+def cosine_similarity_from_distance(distance: float, space: str) -> float:
+    """Cosine similarity of two unit-length vectors from Chroma's distance in the given HNSW space"""
+    if space == "l2":
+        # Chroma reports squared L2, which for unit vectors is 2 - 2cos
+        return 1.0 - distance / 2.0
+    if space in ("cosine", "ip"):
+        return 1.0 - distance
+    raise ValueError(f"Unsupported HNSW space: {space}")
+
 class ChromaDBEmbeddings(Embeddings):
-    """Wrapper for ChromaDB default embeddings to work with Langchain"""
+    """Wrapper for the ONNX MiniLM embedder to work with Langchain"""
     
     def __init__(self):
-        from chromadb.utils import embedding_functions
-        self.ef = embedding_functions.DefaultEmbeddingFunction()
+        self.ef = OnnxMiniLM()
+        self.cache = EmbeddingCache(model_name=f"{EMBEDDING_MODEL}:{EMBEDDING_QUANTIZATION}")
+        self._load_lock = threading.Lock()
+        self._model_loaded = False
+        # Per-instance LRU so repeated questions skip the embedding model
+        self._embed_query_cached = functools.lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)(self._embed_normalized_query)
+    
+    def ensure_model_loaded(self):
+        """Load the model weights once, even when called from several threads"""
+        if self._model_loaded:
+            return
+        with self._load_lock:
+            if not self._model_loaded:
+                self.ef.load()
+                self.ef(["warmup"])
+                self._model_loaded = True
+    
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """Embed documents as an (n, dim) float32 array, reusing cached vectors for known text"""
+        self.ensure_model_loaded()
+        return self.cache.embed(texts, self.ef.encode)
     
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Embed a list of documents"""
-        return self.ef(texts)
+        return self.embed_array(texts).tolist()
+    
+    def _embed_normalized_query(self, normalized_query: str) -> Tuple[float, ...]:
+        """Embed an already-normalized query (immutable so cached entries stay intact)"""
+        self.ensure_model_loaded()
+        return tuple(self.ef.encode([normalized_query])[0].tolist())
     
     def embed_query(self, text: str) -> List[float]:
-        """Embed a single query"""
-        return self.ef([text])[0]
+        """Embed a single query, reusing vectors for repeated questions"""
+        # The MiniLM tokenizer is uncased, so lowercasing and collapsing whitespace
+        # only widens cache hits without changing the embedding
+        normalized_query = " ".join(text.lower().split())
+        return list(self._embed_query_cached(normalized_query))
 
 class VectorStoreManager:
     """Manage vector database operations"""
@@ -47,24 +94,107 @@ class VectorStoreManager:
             )
             
             # Initialize vector store
-            self.vector_store = Chroma(
-                client=self.client,
-                collection_name=COLLECTION_NAME,
-                embedding_function=self.embeddings,
-                persist_directory=str(VECTORDB_DIR)
-            )
+            self._open_collection()
+            
+            # Bumped on every write so callers can tell when cached answers are stale
+            self.revision = 0
             
-            logger.info("VectorStoreManager initialized successfully")
+            logger.info(f"VectorStoreManager initialized successfully (index settings: {self.get_index_settings()})")
             
         except Exception as e:
             logger.error(f"Error initializing VectorStoreManager: {str(e)}")
             raise
     
-    def add_documents(self, documents: List[Document]) -> List[str]:
-        """Add documents to vector store"""
+    def ensure_model_loaded(self):
+        """Warm up the embedding model so the first upload doesn't pay the load cost"""
+        try:
+            logger.info("Warming up embedding model")
+            self.embeddings.ensure_model_loaded()
+            logger.info("Embedding model loaded")
+        except Exception as e:
+            logger.error(f"Error warming up embedding model: {str(e)}")
+    
+    def _open_collection(self):
+        """Build the LangChain wrapper over the collection, creating it if needed, and a raw handle to it"""
+        self.vector_store = Chroma(
+            client=self.client,
+            collection_name=COLLECTION_NAME,
+            embedding_function=self.embeddings,
+            persist_directory=str(VECTORDB_DIR),
+            collection_metadata=self._collection_metadata()
+        )
+        # Raw collection handle for counts and batched writes, fetched through the
+        # client rather than the wrapper's private attribute
+        self._collection = self.client.get_collection(COLLECTION_NAME, embedding_function=None)
+    
+    def _collection_metadata(self) -> Optional[Dict]:
+        """HNSW index settings for a collection that doesn't exist yet, None for an existing one"""
+        try:
+            self.client.get_collection(COLLECTION_NAME)
+            # Chroma copies hnsw:* settings into the vector index only when the collection
+            # is created; passing new ones later rewrites its metadata but not the index
+            return None
+        except ValueError:
+            pass
+        
+        profile = ANN_PROFILE
+        if profile not in ANN_SEARCH_EF:
+            logger.warning(f"Unknown ANN profile '{profile}', using 'balanced'")
+            profile = "balanced"
+        
+        return {
+            "hnsw:space": HNSW_SPACE,
+            "hnsw:construction_ef": HNSW_CONSTRUCTION_EF,
+            "hnsw:M": HNSW_M,
+            "hnsw:search_ef": ANN_SEARCH_EF[profile],
+            "ann_profile": profile
+        }
+    
+    def get_index_settings(self) -> Dict[str, Optional[str]]:
+        """Distance space and search profile the current index was built with"""
+        metadata = self._collection.metadata or {}
+        return {
+            "space": metadata.get("hnsw:space", "l2"),
+            # Collections created before profiles existed run on Chroma's defaults
+            "profile": metadata.get("ann_profile")
+        }
+    
+    def add_documents(self, documents: List[Document], progress_callback: Optional[Callable[[int, int], None]] = None) -> List[str]:
+        """Add documents to vector store, reporting (stored, total) after each window"""
         try:
             logger.info(f"Adding {len(documents)} documents to vector store")
-            ids = self.vector_store.add_documents(documents)
+            if not documents:
+                return []
+            
+            ids = [str(uuid.uuid4()) for _ in documents]
+            
+            # Pipeline the work: embed window N+1 while a writer thread stores window N
+            self.revision += 1
+            with ThreadPoolExecutor(max_workers=1) as writer:
+                pending_write = None
+                for start in range(0, len(documents), INGEST_BATCH_SIZE):
+                    window = documents[start:start + INGEST_BATCH_SIZE]
+                    texts = [doc.page_content for doc in window]
+                    embeddings = self.embeddings.embed_array(texts)
+                    
+                    if pending_write is not None:
+                        pending_write.result()
+                        if progress_callback:
+                            progress_callback(start, len(documents))
+                    pending_write = writer.submit(
+                        self._collection.add,
+                        ids=ids[start:start + len(window)],
+                        # Chroma 0.4 only accepts nested lists; convert once, at the boundary
+                        embeddings=embeddings.tolist(),
+                        documents=texts,
+                        metadatas=[doc.metadata for doc in window]
+                    )
+                
+                if pending_write is not None:
+                    pending_write.result()
+                    if progress_callback:
+                        progress_callback(len(documents), len(documents))
+            
             logger.info(f"Successfully added {len(ids)} documents")
             return ids
         except Exception as e:
@@ -81,27 +211,52 @@ class VectorStoreManager:
             logger.error(f"Error in similarity search: {str(e)}")
             raise
     
+    def similarity_search_with_scores(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
+        """Search for similar documents scored by cosine similarity, best first"""
+        try:
+            # LangChain's relevance scores depend on the collection's space (and assume
+            # plain L2 where Chroma reports squared L2), so convert raw distances here
+            space = self.get_index_settings()["space"]
+            results = [
+                (doc, cosine_similarity_from_distance(distance, space))
+                for doc, distance in self.vector_store.similarity_search_with_score(query, k=k)
+            ]
+            logger.info(f"Found {len(results)} similar documents")
+            return results
+        except Exception as e:
+            logger.error(f"Error in scored similarity search: {str(e)}")
+            raise
+    
     def clear_collection(self):
-        """Clear all documents from the collection"""
+        """Clear all documents by recreating the collection with the current HNSW settings"""
         try:
+            # Dropping the collection frees its HNSW index; deleting ids would only mark
+            # labels deleted, and recreating is what applies new space/graph settings
             self.client.delete_collection(COLLECTION_NAME)
-            self.vector_store = Chroma(
-                client=self.client,
-                collection_name=COLLECTION_NAME,
-                embedding_function=self.embeddings,
-                persist_directory=str(VECTORDB_DIR)
-            )
+            
+            # A fresh wrapper over the same client creates the new collection; it shares
+            # self.embeddings, so the loaded model and its caches are kept
+            self._open_collection()
+            self.revision += 1
             logger.info("Collection cleared successfully")
         except Exception as e:
             logger.error(f"Error clearing collection: {str(e)}")
             raise
     
+    def get_embedding_cache_stats(self) -> Dict[str, float]:
+        """Get hit/miss counters for the embedding cache"""
+        cache = self.embeddings.cache
+        return {"hits": cache.hits, "misses": cache.misses, "hit_rate": cache.hit_rate}
+    
+    def get_query_cache_stats(self) -> Dict[str, int]:
+        """Get hit/miss counters for the query embedding cache"""
+        info = self.embeddings._embed_query_cached.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+    
     def get_collection_count(self) -> int:
         """Get number of documents in collection"""
         try:
-            collection = self.client.get_collection(COLLECTION_NAME)
-            count = collection.count()
-            return count
+            return self._collection.count()
         except Exception as e:
             logger.error(f"Error getting collection count: {str(e)}")
             return 0
\ No newline at end of file